@@ -0,0 +1 @@
+"""Hospital Readmission Predictor AI Agent (HRPA) helpers. See hrpa.generator for synthetic data generation."""
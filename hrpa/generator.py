@@ -0,0 +1,667 @@
+"""
+hrpa.generator
+
+Canonical synthetic patient record generator shared by the appender script (Synthetic_Data_Generator.py)
+and anything else that needs HRPA data.
+
+- generate_patient_batch(n, rng) draws n records as a dict of NumPy column arrays (fast path).
+- generate_patient_record()/generate_patient_records() build record dicts with the stdlib only (fallback when NumPy
+  is missing).
+- write_csv_batch / write_ndjson_batch / write_jsonl_finetune_batch / write_parquet_batches serialize a batch
+  to an open sink with one write per batch.
+
+Run "python -m hrpa.generator" for a micro-benchmark of each stage; use it to catch performance regressions.
+"""
+
+import bisect
+import csv
+import io
+import itertools
+import json
+import os
+import random
+import signal
+import string
+import time
+import uuid
+from datetime import datetime, timedelta
+
+# Optional modules improve distribution realism and enable the vectorized batch path;
+# the generator falls back to stdlib if unavailable.
+try:
+    import numpy as np
+except Exception:
+    np = None
+
+# orjson (C) encodes NDJSON batches several times faster than the stdlib json module.
+try:
+    import orjson
+except Exception:
+    orjson = None
+
+# pyarrow is only needed for the optional Parquet sink.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except Exception:
+    pa = None
+
+# CSV column order (change order or add/remove fields here and propagate to record builder below)
+COLUMNS = [
+    "PatientID", "Age", "Gender", "AdmissionDate", "DischargeDate", "Diagnosis", "LengthOfStay",
+    "PriorAdmissions", "Medications", "ReadmittedWithin30Days", "BMI", "SmokingStatus",
+    "AlcoholUse", "BloodPressure", "CholesterolLevel", "HbA1c", "FollowUpAppointmentScheduled",
+    "InsuranceType", "RecordGeneratedAt"
+]
+
+# Prompt/completion templates for the fine-tuning JSONL; fields are COLUMNS names.
+FINETUNE_PROMPT = (
+    "Patient {PatientID} ({Age} y/o {Gender}) diagnosed with {Diagnosis}, admitted on {AdmissionDate} "
+    "and discharged on {DischargeDate}. Clinical factors: BMI={BMI}, BP={BloodPressure}, HbA1c={HbA1c}, "
+    "Cholesterol={CholesterolLevel}, Smoking={SmokingStatus}, Alcohol={AlcoholUse}. "
+    "Prior admissions={PriorAdmissions}, Medications={Medications}."
+)
+FINETUNE_COMPLETION = " ReadmittedWithin30Days: {ReadmittedWithin30Days}"
+
+# Parquet schema in COLUMNS order. String columns are dictionary-encoded by the writer.
+if pa:
+    # Numeric types match the narrow dtypes of generate_patient_batch
+    PARQUET_SCHEMA = pa.schema([
+        ("PatientID", pa.string()), ("Age", pa.int16()), ("Gender", pa.string()),
+        ("AdmissionDate", pa.string()), ("DischargeDate", pa.string()), ("Diagnosis", pa.string()),
+        ("LengthOfStay", pa.int16()), ("PriorAdmissions", pa.int16()), ("Medications", pa.string()),
+        ("ReadmittedWithin30Days", pa.int8()), ("BMI", pa.float32()), ("SmokingStatus", pa.string()),
+        ("AlcoholUse", pa.string()), ("BloodPressure", pa.string()), ("CholesterolLevel", pa.int16()),
+        ("HbA1c", pa.float32()), ("FollowUpAppointmentScheduled", pa.int8()), ("InsuranceType", pa.string()),
+        ("RecordGeneratedAt", pa.string()),
+    ])
+# Decimal places of the float columns (BMI, HbA1c)
+FLOAT_DECIMALS = 1
+# Rows buffered per Parquet row group; small batches would otherwise produce thousands of tiny row groups.
+PARQUET_ROW_GROUP_ROWS = 10000
+# Buffered Parquet rows are also flushed once they are this old, bounding what an unclean exit can lose.
+PARQUET_FLUSH_SECONDS = 30.0
+
+# ------------- Data pools and parameter tables -------------
+# Modify diagnoses, meds, and insurance distributions here to reflect your population.
+DIAGNOSES = {
+    "Hypertension": {"base_los": 3, "los_sd": 2, "readmit_base": 0.05},
+    "Heart Failure": {"base_los": 6, "los_sd": 4, "readmit_base": 0.18},
+    "Pneumonia": {"base_los": 5, "los_sd": 3, "readmit_base": 0.12},
+    "Stroke": {"base_los": 8, "los_sd": 5, "readmit_base": 0.20},
+    "Diabetes": {"base_los": 4, "los_sd": 3, "readmit_base": 0.10},
+    "COPD": {"base_los": 5, "los_sd": 3, "readmit_base": 0.15},
+    "Fracture": {"base_los": 2, "los_sd": 1, "readmit_base": 0.04},
+    "Sepsis": {"base_los": 10, "los_sd": 7, "readmit_base": 0.22},
+    "Cancer": {"base_los": 7, "los_sd": 6, "readmit_base": 0.14},
+    "Other": {"base_los": 3, "los_sd": 2, "readmit_base": 0.06},
+}
+
+GENDERS = ["Male", "Female", "Other"]
+SMOKING_STATUSES = ["Never", "Former", "Current"]
+ALCOHOL_USE = ["None", "Moderate", "Heavy"]
+INSURANCE_TYPES = ["Private", "Public", "Self-Pay"]
+
+MEDICATION_POOLS = {
+    "Hypertension": ["ACE Inhibitors", "Beta Blockers", "Calcium Channel Blockers", "Diuretics"],
+    "Heart Failure": ["ACE Inhibitors", "Beta Blockers", "Diuretics", "Aldosterone Antagonists"],
+    "Pneumonia": ["Antibiotics", "Bronchodilators"],
+    "Stroke": ["Antiplatelets", "Anticoagulants", "Statins"],
+    "Diabetes": ["Insulin", "Metformin", "SGLT2 Inhibitors"],
+    "COPD": ["Bronchodilators", "Inhaled Steroids"],
+    "Fracture": ["Analgesics", "Opioids"],
+    "Sepsis": ["Antibiotics", "Vasopressors"],
+    "Cancer": ["Chemotherapy", "Analgesics"],
+    "Other": ["Analgesics", "Multivitamins"],
+}
+# ------------- End data pools -------------
+
+# ------------- Precomputed lookup tables -------------
+# Built once at import from the pools above so record and batch generation only index into them.
+DIAG_NAMES = list(DIAGNOSES)
+
+# Age-aware diagnosis weights in DIAG_NAMES order; rows are age bands <65, 65-79, 80+.
+# Edit these weight vectors to change diagnosis mix by age band.
+DIAG_WEIGHTS_BY_AGE = [
+    [0.18, 0.08, 0.06, 0.03, 0.12, 0.05, 0.12, 0.04, 0.15, 0.17],
+    [0.20, 0.18, 0.06, 0.07, 0.08, 0.10, 0.04, 0.05, 0.07, 0.15],
+    [0.15, 0.20, 0.05, 0.05, 0.08, 0.12, 0.05, 0.05, 0.10, 0.15],
+]
+# Smoking weights in SMOKING_STATUSES order; rows are age bands <30, 30-64, 65+.
+SMOKING_WEIGHTS_BY_AGE = [
+    [0.6, 0.15, 0.25],
+    [0.5, 0.25, 0.25],
+    [0.6, 0.3, 0.1],
+]
+ALCOHOL_WEIGHTS = [0.35, 0.55, 0.10]   # ALCOHOL_USE order
+INSURANCE_WEIGHTS = [0.5, 0.4, 0.1]    # INSURANCE_TYPES order
+MED_COUNT_WEIGHTS = [0.6, 0.3, 0.1]    # 1, 2 or 3 medications per record
+
+# Cumulative weights for the scalar path, so each draw is one bisect instead of random.choices
+# re-accumulating the weights on every call.
+_CUM_DIAG_BY_AGE = [list(itertools.accumulate(w)) for w in DIAG_WEIGHTS_BY_AGE]
+_CUM_SMOKING_BY_AGE = [list(itertools.accumulate(w)) for w in SMOKING_WEIGHTS_BY_AGE]
+_CUM_ALCOHOL = list(itertools.accumulate(ALCOHOL_WEIGHTS))
+_CUM_INSURANCE = list(itertools.accumulate(INSURANCE_WEIGHTS))
+_CUM_MED_COUNT = list(itertools.accumulate(MED_COUNT_WEIGHTS))
+
+def _cumulative(weights):
+    """Normalized cumulative weights along the last axis. The last bin is exactly 1.0,
+    so every uniform draw in [0, 1) lands in a bin."""
+    cum = np.cumsum(weights, axis=-1, dtype=float)
+    return cum / cum[..., -1:]
+
+if np:
+    DIAG_NAMES_ARR = np.array(DIAG_NAMES)
+    DIAG_BASE_LOS = np.array([DIAGNOSES[d]["base_los"] for d in DIAG_NAMES], dtype=float)
+    DIAG_READMIT = np.array([DIAGNOSES[d]["readmit_base"] for d in DIAG_NAMES])
+    DIAG_CUMWEIGHTS = _cumulative(DIAG_WEIGHTS_BY_AGE)
+    SMOKING_CUMWEIGHTS = _cumulative(SMOKING_WEIGHTS_BY_AGE)
+    ALCOHOL_CUMWEIGHTS = _cumulative(ALCOHOL_WEIGHTS)
+    INSURANCE_CUMWEIGHTS = _cumulative(INSURANCE_WEIGHTS)
+    MED_COUNT_CUMWEIGHTS = _cumulative(MED_COUNT_WEIGHTS)
+    DIABETES_ID = DIAG_NAMES.index("Diabetes")
+    HYPERTENSION_ID = DIAG_NAMES.index("Hypertension")
+    SHOCK_RISK_IDS = [DIAG_NAMES.index("Sepsis"), DIAG_NAMES.index("Heart Failure")]
+    # Medication pools as a padded (diagnosis, slot) table plus the real pool size of each diagnosis
+    _pools = [MEDICATION_POOLS.get(d, MEDICATION_POOLS["Other"]) for d in DIAG_NAMES]
+    MED_POOL_WIDTH = max(len(p) for p in _pools)
+    MED_POOL_TABLE = np.array([p + [""] * (MED_POOL_WIDTH - len(p)) for p in _pools])
+    MED_POOL_SIZE = np.array([len(p) for p in _pools])
+    GENDERS_ARR = np.array(GENDERS)
+    SMOKING_STATUSES_ARR = np.array(SMOKING_STATUSES)
+    ALCOHOL_USE_ARR = np.array(ALCOHOL_USE)
+    INSURANCE_TYPES_ARR = np.array(INSURANCE_TYPES)
+    # PatientIDs come from OS entropy rather than the seeded stream, like uuid4 in the scalar path,
+    # so rerunning a seeded generator does not append duplicate IDs.
+    ID_RNG = np.random.default_rng()
+# ------------- End lookup tables -------------
+
+# ---------------- Realistic random helper functions ----------------
+# These functions implement correlated randomness; change weights and distributions here.
+
+def _choose(population, cum_weights):
+    """One weighted choice from precomputed cumulative weights; consumes the RNG exactly like random.choices."""
+    return population[bisect.bisect(cum_weights, random.random() * cum_weights[-1], 0, len(cum_weights) - 1)]
+
+def realistic_age():
+    """Return an age sampled from a mixed distribution to mimic inpatient populations.
+    Edit the cluster probabilities or parameters to shift population age profile."""
+    if random.random() < 0.65:
+        # Older cluster (most inpatients)
+        if np:
+            return int(max(18, min(100, int(np.random.normal(75, 8)))))
+        return random.randint(65, 95)
+    else:
+        # Younger/middle-aged cluster
+        if np:
+            return int(max(18, min(64, int(np.random.normal(45, 12)))))
+        return random.randint(18, 64)
+
+def realistic_bmi(age):
+    """BMI with mild age dependence. Tweak means and sds for different BMI profiles."""
+    if np:
+        if age < 30:
+            return round(float(np.clip(np.random.normal(24, 3.5), 15, 40)), 1)
+        if age < 60:
+            return round(float(np.clip(np.random.normal(28, 4.5), 18, 45)), 1)
+        return round(float(np.clip(np.random.normal(27, 4.0), 18, 42)), 1)
+    else:
+        base = 24 if age < 30 else (28 if age < 60 else 27)
+        return round(min(max(random.gauss(base, 4), 15), 45), 1)
+
+def realistic_bp(age, diagnosis):
+    """Systolic/diastolic BP formatted as 'S/D'. Adjust shifts for specific diagnoses here."""
+    sys = int(random.gauss(125, 12))
+    dia = int(random.gauss(78, 8))
+    if diagnosis == "Hypertension" or age > 70:
+        sys += abs(int(random.gauss(10, 8)))
+    if diagnosis in ("Sepsis", "Heart Failure") and random.random() < 0.3:
+        sys = max(80, sys - int(random.gauss(30, 10)))
+        dia = max(40, dia - int(random.gauss(15, 6)))
+    if np:
+        sys = int(np.clip(sys, 70, 220)); dia = int(np.clip(dia, 40, 130))
+    else:
+        sys = max(70, min(sys, 220)); dia = max(40, min(dia, 130))
+    return f"{sys}/{dia}"
+
+def realistic_cholesterol(age):
+    """Total cholesterol mg/dL with small age effect."""
+    base = 190 + (0.1 * max(age - 40, 0))
+    val = int(random.gauss(base, 35))
+    return int(max(100, min(val, 400)))
+
+def realistic_hba1c(diagnosis):
+    """HbA1c higher for diabetes patients; adjust means/sds as needed."""
+    if diagnosis == "Diabetes":
+        return round(max(5.6, min(random.gauss(8.5, 1.9), 15)), 1)
+    return round(max(4.5, min(random.gauss(5.4, 0.4), 7.5)), 1)
+
+def select_medications(diagnosis):
+    """Select 1-3 meds from the diagnosis-specific pool. Modify pool for new drugs."""
+    pool = MEDICATION_POOLS.get(diagnosis, MEDICATION_POOLS["Other"])
+    k = _choose((1, 2, 3), _CUM_MED_COUNT)
+    meds = random.sample(pool, min(k, len(pool)))
+    return "; ".join(meds)
+
+def length_of_stay_for(diagnosis, age):
+    """Generate LengthOfStay with a skew and rare long tails. Adjust tail probability as needed."""
+    params = DIAGNOSES.get(diagnosis, DIAGNOSES["Other"])
+    base = params["base_los"]
+    if np:
+        los = int(max(1, round(np.random.lognormal(mean=np.log(max(0.9, base)), sigma=0.5))))
+    else:
+        los = max(1, int(random.gauss(base, params["los_sd"])))
+    if age >= 80:
+        los += int(random.choice([0, 1, 2]))
+    if random.random() < 0.02:
+        los += random.randint(5, 30)
+    return los
+
+def prior_admissions_for(age):
+    """Prior admissions correlated with age. Adjust lambda values to tune counts."""
+    lam = 0.2 if age < 40 else (0.7 if age < 65 else 1.6)
+    if np:
+        val = int(np.random.poisson(lam))
+    else:
+        val = sum(1 for _ in range(6) if random.random() < lam/1.5)
+    return int(min(val, 20))
+
+def smoking_for(age):
+    """Smoking status probabilities by age group. Change weights to reflect target population."""
+    return _choose(SMOKING_STATUSES, _CUM_SMOKING_BY_AGE[0 if age < 30 else (1 if age < 65 else 2)])
+
+def alcohol_for(_age):
+    """Alcohol use probabilities. Edit weights for different communities."""
+    return _choose(ALCOHOL_USE, _CUM_ALCOHOL)
+
+def readmission_risk(age, diagnosis, prior_adm, los, smoking, bmi):
+    """Additive risk model for readmission probability. Tweak coefficients for calibration."""
+    base = DIAGNOSES.get(diagnosis, DIAGNOSES["Other"])["readmit_base"]
+    p = base
+    p += 0.01 * max(0, (age - 50) / 10)
+    p += 0.03 * min(prior_adm, 5)
+    p += 0.02 * max(0, (bmi - 25) / 5)
+    p += 0.02 if smoking == "Current" else 0.0
+    p += 0.01 if los > 7 else 0.0
+    return min(max(p, 0.01), 0.9)
+# ------------- End helper functions -------------
+
+# ---------------- Record assembly ----------------
+def admission_and_discharge_dates(length_of_stay_days, now=None):
+    """Create admission and discharge dates in YYYY-MM-DD, counted back from now; adjust lookback window here."""
+    days_back = int(abs(random.gauss(200, 150)))  # admissions within ~2 years, skewed recent
+    admission = (now or datetime.now()) - timedelta(days=days_back) + timedelta(minutes=random.randint(0, 1440))
+    discharge = admission + timedelta(days=length_of_stay_days, hours=random.randint(0, 23), minutes=random.randint(0, 59))
+    return admission.strftime("%Y-%m-%d"), discharge.strftime("%Y-%m-%d")
+
+def generate_patient_record(now=None, generated_at=None):
+    """Build one coherent patient record dict. Edit fields here to change output schema.
+    now (datetime) and generated_at (its "%Y-%m-%d %H:%M:%S" string) default to the current time;
+    generate_patient_records() passes one clock read for a whole batch."""
+    if now is None:
+        now = datetime.now()
+    age = realistic_age()
+    gender = random.choice(GENDERS)
+
+    # Age-aware diagnosis sampling; weights live in DIAG_WEIGHTS_BY_AGE
+    age_band = 2 if age >= 80 else (1 if age >= 65 else 0)
+    diagnosis = _choose(DIAG_NAMES, _CUM_DIAG_BY_AGE[age_band])
+
+    los = length_of_stay_for(diagnosis, age)
+    prior_adm = prior_admissions_for(age)
+    adm_date, dis_date = admission_and_discharge_dates(los, now)
+
+    bmi = realistic_bmi(age)
+    smoking = smoking_for(age)
+    alcohol = alcohol_for(age)
+    bp = realistic_bp(age, diagnosis)
+    chol = realistic_cholesterol(age)
+    hba1c = realistic_hba1c(diagnosis)
+    meds = select_medications(diagnosis)
+    follow_up = 1 if random.random() < 0.7 else 0
+    insurance = _choose(INSURANCE_TYPES, _CUM_INSURANCE)
+
+    readmit_prob = readmission_risk(age, diagnosis, prior_adm, los, smoking, bmi)
+    readmitted = 1 if random.random() < readmit_prob else 0
+
+    # PatientID: 8 hex characters for compactness; swap to uuid.uuid4().hex for full UUID
+    patient_id = uuid.uuid4().hex[:8]
+
+    return {
+        "PatientID": patient_id,
+        "Age": int(age),
+        "Gender": gender,
+        "AdmissionDate": adm_date,
+        "DischargeDate": dis_date,
+        "Diagnosis": diagnosis,
+        "LengthOfStay": int(los),
+        "PriorAdmissions": int(prior_adm),
+        "Medications": meds,
+        "ReadmittedWithin30Days": int(readmitted),
+        "BMI": float(bmi),
+        "SmokingStatus": smoking,
+        "AlcoholUse": alcohol,
+        "BloodPressure": bp,
+        "CholesterolLevel": int(chol),
+        "HbA1c": float(hba1c),
+        "FollowUpAppointmentScheduled": int(follow_up),
+        "InsuranceType": insurance,
+        "RecordGeneratedAt": generated_at or now.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+def generate_patient_records(n):
+    """Build n record dicts that share one clock read, like generate_patient_batch."""
+    now = datetime.now()
+    generated_at = now.strftime("%Y-%m-%d %H:%M:%S")
+    return [generate_patient_record(now, generated_at) for _ in range(n)]
+
+# ---------------- Vectorized batch assembly ----------------
+# Used whenever NumPy is available: each field is drawn for the whole batch with one call per
+# distribution instead of ~15 scalar RNG calls per record. Distributions mirror the helpers above,
+# so keep both in sync when editing parameters.
+
+def _draw_categorical(rng, cum, n):
+    """Weighted choice of n category indices from _cumulative() weights. cum is either one
+    cumulative vector shared by every draw or an (n, k) array holding a separate row per draw."""
+    u = rng.random(n)
+    if cum.ndim == 1:
+        return np.searchsorted(cum, u, side="right")
+    return (u[:, None] < cum).argmax(axis=1)
+
+def patient_ids(n, rng):
+    """n PatientIDs of 8 hex characters, drawn as 32-bit integers and formatted in one vectorized step."""
+    return np.char.mod("%08x", rng.integers(0, 1 << 32, size=n, dtype=np.uint32))
+
+def generate_patient_batch(n, rng, id_rng=None):
+    """Build n coherent patient records as a dict of length-n arrays keyed by COLUMNS, drawn from a NumPy Generator.
+    PatientIDs are drawn from id_rng (default ID_RNG)."""
+    # Age: older cluster with probability 0.65, younger/middle-aged otherwise (see realistic_age)
+    older = rng.random(n) < 0.65
+    ages = np.where(older,
+                    np.clip(rng.normal(75, 8, n).astype(int), 18, 100),
+                    np.clip(rng.normal(45, 12, n).astype(int), 18, 64))
+    genders = GENDERS_ARR[rng.integers(0, len(GENDERS), n)]
+
+    # Age-aware diagnosis sampling; one cumulative weight row per age band (see DIAG_WEIGHTS_BY_AGE)
+    age_band = (ages >= 65).astype(int) + (ages >= 80)
+    diag_idx = _draw_categorical(rng, np.take(DIAG_CUMWEIGHTS, age_band, axis=0), n)
+    diagnoses = DIAG_NAMES_ARR[diag_idx]
+
+    # Length of stay: lognormal around the diagnosis base, extra days for 80+, rare long tails
+    los = np.maximum(1, np.rint(rng.lognormal(np.log(np.maximum(0.9, DIAG_BASE_LOS[diag_idx])), 0.5))).astype(int)
+    los += np.where(ages >= 80, rng.integers(0, 3, n), 0)
+    los += np.where(rng.random(n) < 0.02, rng.integers(5, 31, n), 0)
+
+    lam = np.where(ages < 40, 0.2, np.where(ages < 65, 0.7, 1.6))
+    prior_adm = np.minimum(rng.poisson(lam), 20)
+
+    # Admission/discharge as datetime64 offsets from one clock read per batch (see admission_and_discharge_dates)
+    now = datetime.now()
+    days_back = np.abs(rng.normal(200, 150, n)).astype(int)
+    admissions = (np.datetime64(now, "s") - days_back.astype("timedelta64[D]")
+                  + rng.integers(0, 1441, n).astype("timedelta64[m]"))
+    discharges = (admissions + los.astype("timedelta64[D]")
+                  + rng.integers(0, 24, n).astype("timedelta64[h]")
+                  + rng.integers(0, 60, n).astype("timedelta64[m]"))
+
+    # BMI bands <30, 30-59, 60+ (see realistic_bmi)
+    bmi_band = (ages >= 30).astype(int) + (ages >= 60)
+    bmi = rng.normal(np.array([24, 28, 27])[bmi_band], np.array([3.5, 4.5, 4.0])[bmi_band])
+    bmi = np.round(np.clip(bmi, np.array([15, 18, 18])[bmi_band], np.array([40, 45, 42])[bmi_band]), FLOAT_DECIMALS)
+
+    # Smoking bands <30, 30-64, 65+ (see SMOKING_WEIGHTS_BY_AGE)
+    smoke_band = (ages >= 30).astype(int) + (ages >= 65)
+    smoke_idx = _draw_categorical(rng, np.take(SMOKING_CUMWEIGHTS, smoke_band, axis=0), n)
+    alcohol_idx = _draw_categorical(rng, ALCOHOL_CUMWEIGHTS, n)
+
+    # Blood pressure (see realistic_bp)
+    sys_bp = rng.normal(125, 12, n).astype(int)
+    dia_bp = rng.normal(78, 8, n).astype(int)
+    sys_bp += np.abs(rng.normal(10, 8, n).astype(int)) * ((diag_idx == HYPERTENSION_ID) | (ages > 70))
+    shock = np.isin(diag_idx, SHOCK_RISK_IDS) & (rng.random(n) < 0.3)
+    sys_bp = np.where(shock, np.maximum(80, sys_bp - rng.normal(30, 10, n).astype(int)), sys_bp)
+    dia_bp = np.where(shock, np.maximum(40, dia_bp - rng.normal(15, 6, n).astype(int)), dia_bp)
+    np.clip(sys_bp, 70, 220, out=sys_bp)
+    np.clip(dia_bp, 40, 130, out=dia_bp)
+    # astype(str) formats in C; np.char.mod("%d") falls back to per-element Python formatting
+    bp = np.char.add(np.char.add(sys_bp.astype(str), "/"), dia_bp.astype(str))
+
+    chol = np.clip(rng.normal(190 + 0.1 * np.maximum(ages - 40, 0), 35).astype(int), 100, 400)
+
+    diabetic = diag_idx == DIABETES_ID
+    hba1c = rng.normal(np.where(diabetic, 8.5, 5.4), np.where(diabetic, 1.9, 0.4))
+    hba1c = np.round(np.clip(hba1c, np.where(diabetic, 5.6, 4.5), np.where(diabetic, 15, 7.5)), FLOAT_DECIMALS)
+
+    # Medications: 1-3 distinct drugs from the diagnosis pool (see select_medications).
+    # Ranking random keys per row samples without replacement; padding slots always rank last.
+    pool_size = MED_POOL_SIZE[diag_idx]
+    n_meds = np.minimum(_draw_categorical(rng, MED_COUNT_CUMWEIGHTS, n) + 1, pool_size)
+    keys = rng.random((n, MED_POOL_WIDTH))
+    keys[np.arange(MED_POOL_WIDTH) >= pool_size[:, None]] = 2.0
+    picks = MED_POOL_TABLE[diag_idx[:, None], np.argsort(keys, axis=1)]
+    meds = picks[:, 0]
+    for j in range(1, 3):
+        meds = np.where(n_meds > j, np.char.add(np.char.add(meds, "; "), picks[:, j]), meds)
+
+    follow_up = (rng.random(n) < 0.7).astype(int)
+    insurance_idx = _draw_categorical(rng, INSURANCE_CUMWEIGHTS, n)
+
+    # Additive readmission risk (see readmission_risk)
+    p = DIAG_READMIT[diag_idx]
+    p = p + 0.01 * np.maximum(0, (ages - 50) / 10)
+    p = p + 0.03 * np.minimum(prior_adm, 5)
+    p = p + 0.02 * np.maximum(0, (bmi - 25) / 5)
+    p = p + np.where(smoke_idx == SMOKING_STATUSES.index("Current"), 0.02, 0.0)
+    p = p + np.where(los > 7, 0.01, 0.0)
+    readmitted = (rng.random(n) < np.clip(p, 0.01, 0.9)).astype(int)
+
+    # Values are drawn at full width, then narrowed: int8 flags, int16 counts/measures, float32 BMI/HbA1c
+    return {
+        "PatientID": patient_ids(n, id_rng if id_rng is not None else ID_RNG),
+        "Age": ages.astype(np.int16),
+        "Gender": genders,
+        "AdmissionDate": np.datetime_as_string(admissions, unit="D"),
+        "DischargeDate": np.datetime_as_string(discharges, unit="D"),
+        "Diagnosis": diagnoses,
+        "LengthOfStay": los.astype(np.int16),
+        "PriorAdmissions": prior_adm.astype(np.int16),
+        "Medications": meds,
+        "ReadmittedWithin30Days": readmitted.astype(np.int8),
+        "BMI": bmi.astype(np.float32),
+        "SmokingStatus": SMOKING_STATUSES_ARR[smoke_idx],
+        "AlcoholUse": ALCOHOL_USE_ARR[alcohol_idx],
+        "BloodPressure": bp,
+        "CholesterolLevel": chol.astype(np.int16),
+        "HbA1c": hba1c.astype(np.float32),
+        "FollowUpAppointmentScheduled": follow_up.astype(np.int8),
+        "InsuranceType": INSURANCE_TYPES_ARR[insurance_idx],
+        "RecordGeneratedAt": np.full(n, now.strftime("%Y-%m-%d %H:%M:%S")),
+    }
+
+# ---------------- Multi-process generation ----------------
+# For large batches, the batch is split into one chunk per worker process. Each chunk is drawn from an
+# independent stream spawned from the main Generator's SeedSequence, so seeded runs stay reproducible.
+
+def init_pool_worker():
+    """Ignore Ctrl+C in pool workers; the main process handles shutdown."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _worker(seed_state, n):
+    """Pool task: generate one chunk of column arrays from its own PCG64 stream.
+    IDs use fresh OS entropy per task so forked workers never share an ID stream."""
+    return generate_patient_batch(n, np.random.Generator(np.random.PCG64(seed_state)), np.random.default_rng())
+
+def generate_patient_batch_parallel(n, rng, pool, workers):
+    """Build n records as column arrays by generating worker-sized chunks in the pool and concatenating them."""
+    sizes = [n // workers + (1 if i < n % workers else 0) for i in range(workers)]
+    seeds = rng.bit_generator.seed_seq.spawn(workers)
+    # starmap keeps chunk order, so a seeded run produces the same rows in the same order
+    parts = pool.starmap(_worker, zip(seeds, sizes))
+    return {c: np.concatenate([p[c] for p in parts]) for c in COLUMNS}
+
+# ---------------- Seeding ----------------
+def make_rng(seed=None):
+    """Seed the global RNGs used by the scalar helpers and return the NumPy Generator for the batch path
+    (None when NumPy is unavailable). With seed=None nothing is reseeded and the Generator uses OS entropy."""
+    if seed is not None:
+        random.seed(seed)
+        if np:
+            np.random.seed(seed)
+    return np.random.default_rng(seed) if np else None
+
+# ---------------- I/O helpers that append ----------------
+class AppendFile:
+    """Unbuffered append-only file. Each write() is one os.write on an O_APPEND descriptor, so a batch handed
+    over as a single bytes payload lands with one syscall and no BufferedWriter copy in between."""
+
+    def __init__(self, path):
+        # O_BINARY (Windows only) stops the C runtime from translating newlines
+        self.fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+
+    def write(self, payload):
+        view = memoryview(payload)
+        while view:  # a regular file normally takes everything at once; loop in case of a short write
+            view = view[os.write(self.fd, view):]
+
+    def fileno(self):
+        return self.fd
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+def csv_needs_header(csv_path):
+    """True if the CSV is missing or empty, i.e. the first append must write the header."""
+    return not os.path.exists(csv_path) or os.path.getsize(csv_path) == 0
+
+def batch_size(batch):
+    """Number of records in a batch (dict of column arrays or list of record dicts)."""
+    return len(batch["PatientID"]) if isinstance(batch, dict) else len(batch)
+
+def _column_values(col):
+    """Native Python values of a column array. float32 columns are widened and re-rounded so that
+    27.3 is written as 27.3, not 27.299999237060547."""
+    if col.dtype == np.float32:
+        return np.round(col.astype(np.float64), FLOAT_DECIMALS).tolist()
+    return col.tolist()
+
+def _column_rows(columns):
+    """Row tuples in COLUMNS order, as native Python values, from a dict of column arrays."""
+    return zip(*(_column_values(columns[c]) for c in COLUMNS))
+
+def write_csv_batch(batch, fcsv, write_header=False):
+    """Append a batch to an open binary CSV handle. batch is a dict of column arrays (vectorized path) or a list
+    of record dicts. The caller checks csv_needs_header() once and passes write_header for the first batch only.
+    Rows are rendered in memory and handed over with a single write."""
+    buf = io.StringIO(newline="")
+    if isinstance(batch, dict):
+        # Rows go straight from the column arrays to csv.writer; building a DataFrame per batch costs more
+        writer = csv.writer(buf)
+        if write_header:
+            writer.writerow(COLUMNS)
+        writer.writerows(_column_rows(batch))
+    else:
+        writer = csv.DictWriter(buf, fieldnames=COLUMNS)
+        if write_header:
+            writer.writeheader()
+        writer.writerows(batch)
+    fcsv.write(buf.getvalue().encode("utf-8"))
+
+def _write_json_lines(rows, f):
+    """Encode rows as JSON lines in memory and hand them to the open binary handle with a single write."""
+    if orjson is not None:
+        payload = b"".join(orjson.dumps(r, default=str, option=orjson.OPT_APPEND_NEWLINE) for r in rows)
+    else:
+        payload = "".join(json.dumps(r, default=str) + "\n" for r in rows).encode("utf-8")
+    f.write(payload)
+
+def write_ndjson_batch(batch, fjson):
+    """Append a batch to an open binary NDJSON handle (one JSON object per line). Safe for streaming appends."""
+    if isinstance(batch, dict):
+        # Rows are zipped from the column arrays as they are encoded; no intermediate list of records
+        batch = (dict(zip(COLUMNS, row)) for row in _column_rows(batch))
+    _write_json_lines(batch, fjson)
+
+def _format_columns(template, columns):
+    """Vectorized template.format(**row) over a dict of column arrays, built with np.char.add."""
+    out = ""
+    for literal, field, _, _ in string.Formatter().parse(template):
+        if literal:
+            out = np.char.add(out, literal)
+        if field:
+            out = np.char.add(out, columns[field].astype(str))
+    return out
+
+def finetune_rows(batch):
+    """Yield prompt/completion dicts for the fine-tuning JSONL, one per record in the batch."""
+    if isinstance(batch, dict):
+        prompts = _format_columns(FINETUNE_PROMPT, batch).tolist()
+        completions = _format_columns(FINETUNE_COMPLETION, batch).tolist()
+        return ({"prompt": p, "completion": c} for p, c in zip(prompts, completions))
+    return ({"prompt": FINETUNE_PROMPT.format(**r), "completion": FINETUNE_COMPLETION.format(**r)} for r in batch)
+
+def write_jsonl_finetune_batch(batch, fjsonl):
+    """Append a batch to an open binary fine-tuning JSONL handle as prompt/completion records."""
+    _write_json_lines(finetune_rows(batch), fjsonl)
+
+# Parquet output needs both the vectorized path and pyarrow.
+HAVE_PARQUET = np is not None and pa is not None
+
+def open_parquet_writer(path):
+    """Open a ParquetWriter for PARQUET_SCHEMA (zstd, dictionary-encoded strings). Close it to write the footer."""
+    return pq.ParquetWriter(path, PARQUET_SCHEMA, compression="zstd")
+
+def write_parquet_batches(batches, parquet_writer):
+    """Write buffered batches of column arrays to an open ParquetWriter as one row group."""
+    parquet_writer.write_table(pa.Table.from_batches(
+        [pa.RecordBatch.from_pydict(b, schema=PARQUET_SCHEMA) for b in batches], schema=PARQUET_SCHEMA))
+
+# ---------------- Micro-benchmark ----------------
+def _benchmark(n, repeats):
+    """Time each pipeline stage on n-record batches and print records per second."""
+    class _Sink:
+        """Discards writes; keeps disk speed out of the serialization timings."""
+        def write(self, payload):
+            pass
+
+    def timed(label, fn):
+        best = float("inf")
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - t0)
+        print(f"  {label:<28} {best * 1e3:9.2f} ms  {n / best:12,.0f} rec/s")
+
+    sink = _Sink()
+    records = generate_patient_records(n)
+    print(f"{n} records per batch, best of {repeats}:")
+    timed("generate_patient_records", lambda: generate_patient_records(n))
+    timed("write_csv_batch (records)", lambda: write_csv_batch(records, sink, True))
+    timed("write_ndjson_batch (records)", lambda: write_ndjson_batch(records, sink))
+    if np is None:
+        print("  (NumPy unavailable: batch path skipped)")
+        return
+    rng = make_rng(0)
+    batch = generate_patient_batch(n, rng)
+    timed("generate_patient_batch", lambda: generate_patient_batch(n, rng))
+    timed("write_csv_batch", lambda: write_csv_batch(batch, sink, True))
+    timed("write_ndjson_batch", lambda: write_ndjson_batch(batch, sink))
+    timed("write_jsonl_finetune_batch", lambda: write_jsonl_finetune_batch(batch, sink))
+    if HAVE_PARQUET:
+        timed("write_parquet_batches", lambda: write_parquet_batches([batch], open_parquet_writer(io.BytesIO())))
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Micro-benchmark the HRPA record generator and batch writers.")
+    parser.add_argument("--n", type=int, default=10000, help="Records per batch")
+    parser.add_argument("--repeats", type=int, default=5, help="Timing repeats per stage (best is reported)")
+    args = parser.parse_args()
+    _benchmark(args.n, args.repeats)